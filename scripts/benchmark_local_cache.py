@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the local cache tier.
+
+Measures the time to open a series (index its folder and decode every
+slice) without a local cache, on a cold local cache (which transcodes the
+series) and on a warm local cache, and checks the cached slices are
+lossless.
+
+Usage:
+    python scripts/benchmark_local_cache.py                      # synthetic series
+    python scripts/benchmark_local_cache.py FOLDER SERIES_NUMBER # real data, e.g. on a network share
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from dicom_viewer.core.local_cache import LocalSeriesCache
+from dicom_viewer.core.slice_cache import HeaderIndex, SliceCache
+
+
+def write_synthetic_series(folder_path, series_number=301, slices=120, size=512):
+    """Write a CT-like series: a noisy disc phantom stored as uncompressed 16-bit DICOM."""
+    import pydicom
+    from pydicom.dataset import Dataset, FileMetaDataset
+    from pydicom.uid import CTImageStorage, ExplicitVRLittleEndian, generate_uid
+
+    os.makedirs(folder_path, exist_ok=True)
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[:size, :size]
+    for i in range(slices):
+        radius = size * (0.35 + 0.05 * np.sin(i / 10))
+        body = (yy - size / 2) ** 2 + (xx - size / 2) ** 2 < radius ** 2
+        image = np.where(body, 1064, 24) + rng.normal(0, 12, (size, size))
+        image = np.clip(image, 0, 4095).astype(np.uint16)
+
+        meta = FileMetaDataset()
+        meta.MediaStorageSOPClassUID = CTImageStorage
+        meta.MediaStorageSOPInstanceUID = generate_uid()
+        meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        ds = Dataset()
+        ds.file_meta = meta
+        ds.SOPClassUID = CTImageStorage
+        ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+        ds.Modality = "CT"
+        ds.SeriesNumber = series_number
+        ds.SeriesDescription = "Synthetic phantom"
+        ds.InstanceNumber = i + 1
+        ds.SliceThickness = 1.0
+        ds.ImagePositionPatient = [0, 0, float(i)]
+        ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+        ds.PixelSpacing = [0.7, 0.7]
+        ds.RescaleSlope = 1
+        ds.RescaleIntercept = -1024
+        ds.WindowWidth = 400
+        ds.WindowCenter = 40
+        ds.Rows = ds.Columns = size
+        ds.BitsAllocated = 16
+        ds.BitsStored = 12
+        ds.HighBit = 11
+        ds.PixelRepresentation = 0
+        ds.SamplesPerPixel = 1
+        ds.PhotometricInterpretation = "MONOCHROME2"
+        ds.PixelData = image.tobytes()
+        pydicom.dcmwrite(os.path.join(folder_path, f"{i + 1:05d}.dcm"), ds, enforce_file_format=True)
+    return str(series_number)
+
+
+def open_series(folder_path, series_number, local_cache=None, ingest=False):
+    """Index the folder and decode every slice of the series, as opening it in the viewer does."""
+    header_index = HeaderIndex(local_cache=local_cache)
+    slice_cache = SliceCache(max_bytes=8 * 1024 ** 3, local_cache=local_cache)
+    start = time.perf_counter()
+    entries = sorted(header_index.series_files(folder_path, series_number), key=lambda entry: entry["instance_number"] or 0)
+    file_names = [entry["file_name"] for entry in entries]
+    if ingest:
+        slice_cache.ingest(folder_path, series_number, file_names, background=False)
+    images = {name: slice_cache.get(os.path.join(folder_path, name)) for name in file_names}
+    return time.perf_counter() - start, images
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", nargs="?", help="DICOM folder (default: generate a synthetic series)")
+    parser.add_argument("series_number", nargs="?", help="Series number to open")
+    parser.add_argument("--cache-dir", help="Local cache directory (default: a temporary directory)")
+    parser.add_argument("--slices", type=int, default=120, help="Slices in the synthetic series")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder_path = args.folder
+        series_number = args.series_number
+        if folder_path is None:
+            folder_path = os.path.join(tmp, "source")
+            series_number = write_synthetic_series(folder_path, slices=args.slices)
+        cache_dir = args.cache_dir or os.path.join(tmp, "cache")
+
+        uncached_time, reference = open_series(folder_path, series_number)
+        LocalSeriesCache(cache_dir).clear()
+        cold_time, _ = open_series(folder_path, series_number, LocalSeriesCache(cache_dir), ingest=True)
+        local_cache = LocalSeriesCache(cache_dir)
+        warm_time, cached = open_series(folder_path, series_number, local_cache)
+
+        lossless = reference.keys() == cached.keys() and all(np.array_equal(reference[name], cached[name]) for name in reference)
+        raw_bytes = sum(image.nbytes for image in reference.values())
+        cache_bytes = local_cache.nbytes
+
+        print(f"Series {series_number} in {folder_path}: {len(reference)} slices, {raw_bytes / 1e6:.1f} MB decoded")
+        print(f"Codec: {local_cache.codec}, cache size {cache_bytes / 1e6:.1f} MB ({raw_bytes / max(cache_bytes, 1):.2f}x)")
+        print(f"{'open':<28}{'seconds':>10}")
+        print(f"{'no local cache':<28}{uncached_time:>10.3f}")
+        print(f"{'cold (transcode on ingest)':<28}{cold_time:>10.3f}")
+        print(f"{'warm (local cache)':<28}{warm_time:>10.3f}")
+        print(f"Warm speedup vs. no cache: {uncached_time / warm_time:.2f}x")
+        print(f"Lossless: {'yes' if lossless else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Load test for the local study server.
+
+Starts a StudyServer on localhost (over a synthetic patient folder unless
+one is given), or targets an already running server with --url, then
+replays a mix of series listings, thumbnails and windowed PNG/raw slice
+requests from concurrent clients. Reports requests/sec and latency
+percentiles per endpoint.
+
+Usage:
+    python scripts/load_test_server.py
+    python scripts/load_test_server.py ROOT_FOLDER --clients 16 --requests 2000
+    python scripts/load_test_server.py --url http://127.0.0.1:8000
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from benchmark_local_cache import write_synthetic_series
+from dicom_viewer.interfaces.study_server import StudyServer
+
+
+def get_json(host, port, path):
+    connection = http.client.HTTPConnection(host, port)
+    connection.request("GET", path)
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    if response.status != 200:
+        raise RuntimeError(f"GET {path} returned {response.status}: {body[:200]!r}")
+    return json.loads(body)
+
+
+def build_workload(host, port, total, revalidate, seed=0):
+    """Discover the served series and build a weighted list of (endpoint, path, etag-revalidation) requests."""
+    rng = random.Random(seed)
+    targets = []
+    for patient in get_json(host, port, "/patients"):
+        base = f"/patients/{quote(patient)}/series"
+        for series in get_json(host, port, base):
+            thicknesses = series["thicknesses"] or ([None] if series["no_thickness"] else [])
+            for thickness in thicknesses:
+                query = f"?thickness={'none' if thickness is None else thickness}"
+                slices = get_json(host, port, f"{base}/{quote(series['series_number'])}/slices{query}")
+                targets.append((base, f"{base}/{quote(series['series_number'])}", query, len(slices)))
+    if not targets:
+        raise RuntimeError("The server has no series to request")
+
+    workload = []
+    for _ in range(total):
+        base, series_path, query, count = rng.choice(targets)
+        index = rng.randrange(count)
+        kind = rng.choices(["series", "thumbnail", "png", "png_windowed", "raw"], weights=[1, 2, 5, 2, 2])[0]
+        if kind == "series":
+            path = base
+        elif kind == "thumbnail":
+            path = f"{series_path}/thumbnail.png{query}"
+        elif kind == "png":
+            path = f"{series_path}/slices/{index}.png{query}"
+        elif kind == "png_windowed":
+            path = f"{series_path}/slices/{index}.png{query}&ww={rng.choice([400, 1500, 2000])}&wc={rng.choice([40, -600, 300])}"
+        else:
+            path = f"{series_path}/slices/{index}.raw{query}"
+        workload.append((kind, path, rng.random() < revalidate))
+    return workload
+
+
+def run_client(host, port, requests, results, etags, lock):
+    connection = http.client.HTTPConnection(host, port)
+    for kind, path, revalidate in requests:
+        headers = {}
+        with lock:
+            etag = etags.get(path)
+        if revalidate and etag:
+            headers["If-None-Match"] = etag
+        start = time.perf_counter()
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        elapsed = time.perf_counter() - start
+        if response.getheader("ETag"):
+            with lock:
+                etags[path] = response.getheader("ETag")
+        results.append((kind, response.status, elapsed))
+    connection.close()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", nargs="?", help="Root folder with one sub-folder per patient (default: synthetic data)")
+    parser.add_argument("--url", help="Target a running server instead of starting one")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent connections")
+    parser.add_argument("--requests", type=int, default=1000, help="Total requests")
+    parser.add_argument("--revalidate", type=float, default=0.3, help="Fraction of requests sent with If-None-Match when an ETag is known")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = None
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port or 80
+        else:
+            root_folder = args.folder
+            if root_folder is None:
+                root_folder = os.path.join(tmp, "estudios")
+                write_synthetic_series(os.path.join(root_folder, "1"), series_number=301, slices=40, size=256)
+                write_synthetic_series(os.path.join(root_folder, "2"), series_number=401, slices=40, size=256)
+            server = StudyServer(root_folder, ("127.0.0.1", 0))
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            host, port = server.server_address[:2]
+
+        try:
+            workload = build_workload(host, port, args.requests, args.revalidate)
+            batches = [workload[i::args.clients] for i in range(args.clients)]
+            results = []
+            etags = {}
+            lock = threading.Lock()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.clients) as executor:
+                for future in [executor.submit(run_client, host, port, batch, results, etags, lock) for batch in batches]:
+                    future.result()
+            elapsed = time.perf_counter() - start
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+    latencies = [latency for _, _, latency in results]
+    statuses = Counter(status for _, status, _ in results)
+    by_kind = defaultdict(list)
+    for kind, _, latency in results:
+        by_kind[kind].append(latency)
+
+    print(f"{len(results)} requests, {args.clients} clients, {elapsed:.2f} s")
+    print(f"Throughput: {len(results) / elapsed:.1f} requests/sec")
+    print(f"Latency p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p95 {percentile(latencies, 0.95) * 1000:.1f} ms, max {max(latencies) * 1000:.1f} ms")
+    print("Status codes: " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+    print(f"{'endpoint':<14}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}")
+    for kind, values in sorted(by_kind.items()):
+        print(f"{kind:<14}{len(values):>7}{percentile(values, 0.5) * 1000:>9.1f}{percentile(values, 0.95) * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
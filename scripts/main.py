@@ -12,6 +12,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from dicom_viewer.interfaces.patient_interface import patient_interface
+from dicom_viewer.core.local_cache import enable_local_cache
 
 
 def main():
@@ -30,6 +31,12 @@ def main():
         print("Usage: python main.py [path_to_dicom_folder]")
         sys.exit(1)
     
+    # Optional local cache tier for folders on slow network storage
+    cache_dir = os.environ.get("DICOM_VIEWER_CACHE_DIR")
+    if cache_dir:
+        cache_mb = int(os.environ.get("DICOM_VIEWER_CACHE_MB", "2048"))
+        enable_local_cache(cache_dir, max_bytes=cache_mb * 1024 * 1024)
+    
     try:
         patient_interface(folder_path)
     except Exception as e:
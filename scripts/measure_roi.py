@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Batch ROI measurements without the viewer.
+
+Measures the same rectangle or ellipse ROI (pixel extents XMIN XMAX YMIN
+YMAX) on many series in parallel and prints one JSON line per series with
+mean/std/min/max in HU and the volume in mL.
+
+Usage:
+    python scripts/measure_roi.py --rect 200 300 200 300 --series D:/estudios_ct/1 301 1.0
+    python scripts/measure_roi.py --ellipse 180 330 180 330 --root D:/estudios_ct --slices 10:40 --workers 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from dicom_viewer.core.roi import ROI, measure_series_batch
+from dicom_viewer.utils.series_utils import find_unique_series_numbers_and_thicknesses
+
+
+def parse_thickness(value):
+    return None if value.lower() == "none" else float(value)
+
+
+def all_series(root_folder):
+    """Every (folder, series number, thickness) under a root with one sub-folder per patient."""
+    series = []
+    for name in sorted(os.listdir(root_folder)):
+        folder_path = os.path.join(root_folder, name)
+        if not os.path.isdir(folder_path):
+            continue
+        for series_number, data in sorted(find_unique_series_numbers_and_thicknesses(folder_path).items()):
+            for thickness in sorted(data["thicknesses"]):
+                series.append((folder_path, series_number, thickness))
+            if data["no_thickness"]:
+                series.append((folder_path, series_number, None))
+    return series
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    shape = parser.add_mutually_exclusive_group(required=True)
+    shape.add_argument("--rect", nargs=4, type=float, metavar=("XMIN", "XMAX", "YMIN", "YMAX"))
+    shape.add_argument("--ellipse", nargs=4, type=float, metavar=("XMIN", "XMAX", "YMIN", "YMAX"))
+    parser.add_argument("--series", nargs="+", action="append", default=[], metavar="FOLDER SERIES [THICKNESS]",
+                        help="Series to measure; thickness is a number or 'none' (default: none). Repeatable")
+    parser.add_argument("--root", help="Measure every series of every patient folder under ROOT")
+    parser.add_argument("--slices", help="Slice range START:STOP, as indices into the series")
+    parser.add_argument("--bins", type=int, default=256, help="Histogram bins over -1024..3072 HU")
+    parser.add_argument("--histogram", action="store_true", help="Include the histogram in the output")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    series = []
+    for values in args.series:
+        if len(values) not in (2, 3):
+            parser.error("--series takes FOLDER SERIES [THICKNESS]")
+        series.append((values[0], values[1], parse_thickness(values[2]) if len(values) == 3 else None))
+    if args.root:
+        series.extend(all_series(args.root))
+    if not series:
+        parser.error("Nothing to measure: give --series or --root")
+
+    roi = ROI("rectangle", args.rect) if args.rect else ROI("ellipse", args.ellipse)
+    slice_range = None
+    if args.slices:
+        start, _, stop = args.slices.partition(":")
+        slice_range = (int(start) if start else None, int(stop) if stop else None)
+
+    start_time = time.perf_counter()
+    results = measure_series_batch(series, roi, slice_range=slice_range, bins=args.bins, max_workers=args.workers)
+    for result in results:
+        if not args.histogram:
+            result.pop("histogram", None)
+        print(json.dumps(result))
+    print(f"Measured {len(results)} series in {time.perf_counter() - start_time:.2f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
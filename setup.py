@@ -46,6 +46,7 @@ setup(
     entry_points={
         "console_scripts": [
             "dicom-viewer=dicom_viewer.__main__:main",
+            "dicom-viewer-server=dicom_viewer.interfaces.study_server:main",
         ],
     },
     include_package_data=True,
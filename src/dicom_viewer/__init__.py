@@ -11,11 +11,13 @@ __author__ = "DICOM Viewer Project"
 
 # Import main classes and functions for easy access
 from .core.dicom_viewer import DicomViewer
+from .core.hanging_layout import HangingLayout
 from .interfaces.patient_interface import patient_interface
 from .interfaces.study_interface import show_series_data as study_show_series_data
 
 __all__ = [
     "DicomViewer",
+    "HangingLayout",
     "patient_interface",
     "study_show_series_data",
 ]
\ No newline at end of file
@@ -9,6 +9,7 @@ This module allows the package to be executed as a script using:
 import sys
 import os
 from .interfaces.patient_interface import patient_interface
+from .core.local_cache import enable_local_cache
 
 
 def main():
@@ -29,6 +30,12 @@ def main():
         print("Usage: python -m dicom_viewer [path_to_dicom_folder]")
         sys.exit(1)
     
+    # Optional local cache tier for folders on slow network storage
+    cache_dir = os.environ.get("DICOM_VIEWER_CACHE_DIR")
+    if cache_dir:
+        cache_mb = int(os.environ.get("DICOM_VIEWER_CACHE_MB", "2048"))
+        enable_local_cache(cache_dir, max_bytes=cache_mb * 1024 * 1024)
+    
     try:
         patient_interface(folder_path)
     except Exception as e:
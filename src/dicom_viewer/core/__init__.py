@@ -5,5 +5,9 @@ Contains the main DicomViewer class and core image processing utilities.
 """
 
 from .dicom_viewer import DicomViewer
+from .hanging_layout import HangingLayout
+from .progressive_loader import ProgressiveLoader
+from .roi import ROI, RoiTool, measure_series, measure_series_batch
+from .slice_cache import HeaderIndex, SliceCache
 
-__all__ = ["DicomViewer"]
\ No newline at end of file
+__all__ = ["DicomViewer", "HangingLayout", "ProgressiveLoader", "ROI", "RoiTool", "measure_series", "measure_series_batch", "HeaderIndex", "SliceCache"]
\ No newline at end of file
@@ -1,14 +1,19 @@
 import os
-import pydicom
 import matplotlib.pyplot as plt
+from .progressive_loader import ProgressiveLoader
+from .roi import RoiTool
+from .slice_cache import shared_header_index, shared_slice_cache
 
 class DicomViewer:
     instances = []
 
-    def __init__(self, folder_path, series_number, thickness, fig=None):
+    def __init__(self, folder_path, series_number, thickness, fig=None, ax=None, slice_cache=None, header_index=None, connect_events=True, progressive=False, prefetch=2):
         self.folder_path = folder_path
         self.series_number = series_number
-        self.thickness = thickness
+        # Header entries store SliceThickness as float; accept '0.3' as well as 0.3
+        self.thickness = float(thickness) if thickness is not None else None
+        self.header_index = header_index if header_index is not None else shared_header_index
+        self.slice_cache = slice_cache if slice_cache is not None else shared_slice_cache
         self.studies = self.load_studies()
         self.current_study_index = 0
         self.current_dicom_index = 0
@@ -16,79 +21,203 @@ class DicomViewer:
             self.fig = plt.figure()
         else:
             self.fig = fig
-        self.fig.canvas.mpl_connect('scroll_event', self.on_scroll)
-        self.fig.canvas.mpl_connect('key_press_event', self.on_key)
-        self.instances.append(self)
+        self.ax = ax if ax is not None else self.fig.add_subplot(111)
+        self.image_artist = None
+        self.prefetch = prefetch
+        self.direction = 1
+        self.loader = None
+        self.load_errors = {}
+        self.error_text = None
+        self.roi_tool = None
+        if progressive:
+            self.loader = ProgressiveLoader(self.slice_cache)
+            self.load_timer = self.fig.canvas.new_timer(interval=30)
+            self.load_timer.add_callback(self.poll_loads)
+        if connect_events:
+            self.fig.canvas.mpl_connect('scroll_event', self.on_scroll)
+            self.fig.canvas.mpl_connect('key_press_event', self.on_key)
+            self.fig.canvas.mpl_connect('close_event', self.on_close)
+            # Matplotlib only keeps weak references to callbacks, so this keeps the viewer alive while its figure is open
+            self.instances.append(self)
 
     def load_studies(self):
         studies = []
-        for file_name in os.listdir(self.folder_path):
-            if file_name.endswith('.dcm'):
-                file_path = os.path.join(self.folder_path, file_name)
-                ds = pydicom.dcmread(file_path)
-                series_number = str(ds.get("SeriesNumber"))
-                thickness = ds.get("SliceThickness")
-                if series_number == self.series_number and (thickness == self.thickness or thickness is None):
-                    if hasattr(ds, 'WindowWidth') and isinstance(ds.WindowWidth, pydicom.multival.MultiValue) and hasattr(ds, 'WindowCenter') and isinstance(ds.WindowCenter, pydicom.multival.MultiValue):
-                        window = float(ds.WindowWidth[0])
-                        center = float(ds.WindowCenter[0])
-                    elif hasattr(ds, 'WindowWidth') and hasattr(ds, 'WindowCenter'):
-                        window = float(ds.WindowWidth)
-                        center = float(ds.WindowCenter)
-                    else:
-                        window = 255
-                        center = 127.5
-                    if not any(study["thickness"] == thickness for study in studies):
-                        studies.append({"thickness": thickness, "files": [file_name], "window_width": window, "window_center": center})
-                    else:
-                        for study in studies:
-                            if study["thickness"] == thickness:
-                                study["files"].append(file_name)
-                                study["window_width"] = window
-                                study["window_center"] = center
-                                break
+        series_entries = self.header_index.series_files(self.folder_path, self.series_number)
+        for entry in series_entries:
+            file_name = entry["file_name"]
+            thickness = entry["thickness"]
+            if thickness == self.thickness or thickness is None:
+                window = entry["window_width"]
+                center = entry["window_center"]
+                if not any(study["thickness"] == thickness for study in studies):
+                    studies.append({"thickness": thickness, "files": [file_name], "window_width": window, "window_center": center})
+                else:
+                    for study in studies:
+                        if study["thickness"] == thickness:
+                            study["files"].append(file_name)
+                            study["window_width"] = window
+                            study["window_center"] = center
+                            break
+        entries = self.header_index.scan(self.folder_path)
         for study in studies:
             study_files = study["files"]
-            study_files.sort(key=lambda x: int(pydicom.dcmread(os.path.join(self.folder_path, x)).get("InstanceNumber")))
+            study_files.sort(key=lambda x: int(entries[x]["instance_number"]))
             study["files"] = study_files
+            study["positions"] = [entries[x]["position"] for x in study_files]
+            study["shapes"] = [(entries[x]["rows"], entries[x]["columns"]) for x in study_files]
+        # Keep a local transcoded copy of the series when a local cache tier is configured
+        series_files = sorted(series_entries, key=lambda entry: (entry["instance_number"] is None, entry["instance_number"] or 0))
+        self.slice_cache.ingest(self.folder_path, self.series_number, [entry["file_name"] for entry in series_files])
         return studies
 
     def load_dicom(self, file_name):
         file_path = os.path.join(self.folder_path, file_name)
-        ds = pydicom.dcmread(file_path)
-        return ds.pixel_array
+        return self.slice_cache.get(file_path)
+
+    def window_limits(self, study):
+        window_width = study["window_width"]
+        window_center = study["window_center"]
+        return (window_center - 0.5 - (window_width - 1) / 2), (window_center - 0.5 + (window_width - 1) / 2)
 
     def show_dicom(self, image=None):
-        plt.clf()
         if not self.studies:
-            plt.text(0.5, 0.5, 'No se encontraron archivos DICOM válidos', ha='center', va='center')
-            plt.draw()
+            self.ax.clear()
+            self.image_artist = None
+            self.ax.text(0.5, 0.5, 'No se encontraron archivos DICOM válidos', ha='center', va='center', transform=self.ax.transAxes)
+            self.ax.axis('off')
+            self.fig.canvas.draw_idle()
             return
         current_study = self.studies[self.current_study_index]
         current_file_name = current_study["files"][self.current_dicom_index]
-        if image is None:
+        loading = False
+        error = self.load_errors.get(os.path.join(self.folder_path, current_file_name))
+        if error is not None:
+            image = None
+        elif image is None and self.loader is not None:
+            image, loading = self.request_dicom(current_study)
+        elif image is None:
             image = self.load_dicom(current_file_name)
 
         window_width = current_study["window_width"]
         window_center = current_study["window_center"]
+        vmin, vmax = self.window_limits(current_study)
 
-        plt.imshow(image, cmap=plt.cm.gray, vmin=(window_center - 0.5 - (window_width - 1) / 2), vmax=(window_center - 0.5 + (window_width - 1) / 2))
-        plt.axis('off')
+        if image is not None:
+            # A low-resolution proxy is stretched over the full slice extent
+            rows, columns = current_study["shapes"][self.current_dicom_index]
+            if rows is None or columns is None:
+                rows, columns = image.shape[:2]
+            extent = (-0.5, columns - 0.5, rows - 0.5, -0.5)
+            # Reuse the image artist so scrolling only swaps pixel data instead of rebuilding the axes
+            if self.image_artist is None:
+                self.ax.clear()
+                self.error_text = None
+                self.image_artist = self.ax.imshow(image, cmap=plt.cm.gray, vmin=vmin, vmax=vmax, extent=extent)
+                self.ax.axis('off')
+            else:
+                self.image_artist.set_data(image)
+                self.image_artist.set_clim(vmin, vmax)
+                if tuple(self.image_artist.get_extent()) != extent:
+                    self.image_artist.set_extent(extent)
+                self.image_artist.set_visible(True)
+        elif self.image_artist is not None:
+            # Never leave the previous slice on screen under the new slice's title
+            self.image_artist.set_visible(False)
+        else:
+            self.ax.axis('off')
+        if error is not None and self.error_text is None:
+            self.error_text = self.ax.text(0.5, 0.5, '', ha='center', va='center', color='red', wrap=True, transform=self.ax.transAxes)
+        if self.error_text is not None:
+            self.error_text.set_text(f'Error al cargar {current_file_name}: {error}' if error is not None else '')
+            self.error_text.set_visible(error is not None)
         thickness = "{:.2f}".format(current_study["thickness"]) if current_study["thickness"] is not None else "Unknown"
         title = f'DICOM {self.current_dicom_index + 1}/{len(current_study["files"])} del estudio {self.series_number} con thickness {thickness}'
-        plt.title(f'{title}\nWindow/Level: {window_width}/{window_center}')
-        plt.draw()
+        if error is not None:
+            title += ' (error)'
+        elif loading:
+            title += ' (vista previa, cargando...)' if image is not None else ' (cargando...)'
+        self.ax.set_title(f'{title}\nWindow/Level: {window_width}/{window_center}')
+        self.fig.canvas.draw_idle()
+
+    def request_dicom(self, study):
+        """
+        Return ``(image, loading)``: the current slice if it is cached, otherwise its
+        low-resolution proxy (or None) while the full slice is decoded in the background.
+
+        Proxies for the rest of the study are prepared at low priority, nearest
+        slices in the scroll direction first; the nearest ones are kept at full
+        resolution, since the user reaches them next.
+        """
+        files = study["files"]
+        index = self.current_dicom_index
+        file_path = os.path.join(self.folder_path, files[index])
+        image = self.slice_cache.peek(file_path)
+        ahead = range(index + self.direction, index + self.direction * (self.prefetch + 1), self.direction)
+        prefetch = [os.path.join(self.folder_path, files[i]) for i in ahead if 0 <= i < len(files)]
+        self.loader.request(file_path, prefetch)
+        nearest = []
+        for distance in range(1, len(files)):
+            for i in (index + self.direction * distance, index - self.direction * distance):
+                if 0 <= i < len(files):
+                    nearest.append(os.path.join(self.folder_path, files[i]))
+        self.loader.request_proxies(nearest, keep_full=2 * self.prefetch)
+        if self.loader.busy:
+            self.load_timer.start()
+        if image is not None:
+            return image, False
+        return self.slice_cache.peek_proxy(file_path), True
+
+    def poll_loads(self):
+        """Swap in the full-resolution slice once its background decode has finished, or show why it failed."""
+        done = self.loader.poll()
+        failed = self.loader.poll_failures()
+        self.load_errors.update((path, str(error) or type(error).__name__) for path, error in failed.items())
+        if self.studies:
+            current_study = self.studies[self.current_study_index]
+            file_path = os.path.join(self.folder_path, current_study["files"][self.current_dicom_index])
+            if file_path in done or file_path in failed:
+                self.show_dicom()
+        if not self.loader.busy:
+            self.load_timer.stop()
+
+    def current_position(self):
+        if not self.studies:
+            return None
+        return self.studies[self.current_study_index]["positions"][self.current_dicom_index]
+
+    def go_to_position(self, position):
+        """Move to the slice nearest to ``position`` (mm). Returns True if the slice changed."""
+        if not self.studies or position is None:
+            return False
+        positions = self.studies[self.current_study_index]["positions"]
+        candidates = [(abs(p - position), i) for i, p in enumerate(positions) if p is not None]
+        if not candidates:
+            return False
+        index = min(candidates)[1]
+        if index == self.current_dicom_index:
+            return False
+        self.current_dicom_index = index
+        self.show_dicom()
+        return True
+
+    def set_window(self, window_width, window_center):
+        for study in self.studies:
+            study["window_width"] = window_width
+            study["window_center"] = window_center
+        self.show_dicom()
 
     def next_dicom(self):
         current_study = self.studies[self.current_study_index]
         if self.current_dicom_index + 1 < len(current_study["files"]):
             self.current_dicom_index += 1
+        self.direction = 1
         self.show_dicom()
 
     def prev_dicom(self):
         current_study = self.studies[self.current_study_index]
         if self.current_dicom_index - 1 >= 0:
             self.current_dicom_index -= 1
+        self.direction = -1
         self.show_dicom()
 
     def increase_window_width(self):
@@ -113,17 +242,33 @@ class DicomViewer:
                 study["window_center"] -= 100
         self.show_dicom()
 
+    def start_roi(self, shape="rectangle", slice_range=None, hist_ax=None, on_update=None):
+        """Replace any current ROI with a new rectangle/ellipse ROI tool measured over ``slice_range``."""
+        if self.roi_tool is not None:
+            self.roi_tool.remove()
+        self.roi_tool = RoiTool(self, shape, slice_range=slice_range, hist_ax=hist_ax, on_update=on_update)
+        return self.roi_tool
+
+    def close(self):
+        """Stop background loading and release the viewer; called when its figure closes."""
+        if self.loader is not None:
+            self.load_timer.stop()
+            self.loader.shutdown()
+        if self in self.instances:
+            self.instances.remove(self)
+
+    def on_close(self, event):
+        self.close()
+
     def on_scroll(self, event):
-        current_fig = plt.gcf()
-        if current_fig == self.fig:
+        if event.canvas.figure is self.fig:
             if event.button == 'down':
                 self.next_dicom()
             elif event.button == 'up':
                 self.prev_dicom()
 
     def on_key(self, event):
-        current_fig = plt.gcf()
-        if current_fig == self.fig:
+        if event.canvas.figure is self.fig:
             if event.key == 'down':
                 self.next_dicom()
             elif event.key == 'up':
@@ -136,6 +281,10 @@ class DicomViewer:
                 self.increase_window_center()
             elif event.key == 'l':
                 self.decrease_window_center()
+            elif event.key == 'r' and self.studies:
+                self.start_roi("rectangle")
+            elif event.key == 'e' and self.studies:
+                self.start_roi("ellipse")
 
 def main():
     folder_path = r'D:\TFG\estudios_ct\1'
@@ -0,0 +1,133 @@
+"""
+Multi-viewport hanging layout.
+
+Arranges several series in an N x M grid inside one figure. All panes share
+a single header index and decoded-slice cache, and can optionally scroll
+together by slice position and share window/level settings.
+"""
+
+import matplotlib.pyplot as plt
+from .dicom_viewer import DicomViewer
+from .slice_cache import shared_header_index, shared_slice_cache
+
+
+class HangingLayout:
+    instances = []
+
+    def __init__(self, rows, cols, fig=None, slice_cache=None, header_index=None, sync_scroll=False, sync_window=False, progressive=False):
+        self.rows = rows
+        self.cols = cols
+        self.sync_scroll = sync_scroll
+        self.sync_window = sync_window
+        self.progressive = progressive
+        self.slice_cache = slice_cache if slice_cache is not None else shared_slice_cache
+        self.header_index = header_index if header_index is not None else shared_header_index
+        self.fig = fig if fig is not None else plt.figure()
+        self.axes = self.fig.subplots(rows, cols, squeeze=False)
+        for ax in self.axes.flat:
+            ax.axis('off')
+        self.panes = {}
+        self.active_pane = None
+        self.fig.canvas.mpl_connect('scroll_event', self.on_scroll)
+        self.fig.canvas.mpl_connect('key_press_event', self.on_key)
+        self.fig.canvas.mpl_connect('button_press_event', self.on_click)
+        self.fig.canvas.mpl_connect('close_event', self.on_close)
+        # Panes do not register themselves; the layout keeps them alive while the figure is open
+        self.instances.append(self)
+
+    def add_series(self, folder_path, series_number, thickness, row=None, col=None):
+        """Load a series into the given cell, or the first free one. Returns its DicomViewer."""
+        if row is None or col is None:
+            free = [(r, c) for r in range(self.rows) for c in range(self.cols) if (r, c) not in self.panes]
+            if not free:
+                raise ValueError(f"Hanging layout {self.rows}x{self.cols} has no free viewport")
+            row, col = free[0]
+        viewer = DicomViewer(folder_path, series_number, thickness, fig=self.fig, ax=self.axes[row, col],
+                             slice_cache=self.slice_cache, header_index=self.header_index, connect_events=False,
+                             progressive=self.progressive)
+        self.panes[(row, col)] = viewer
+        if self.active_pane is None:
+            self.active_pane = viewer
+        return viewer
+
+    def show(self):
+        for viewer in self.panes.values():
+            viewer.show_dicom()
+
+    def pane_at(self, ax):
+        for viewer in self.panes.values():
+            if viewer.ax is ax:
+                return viewer
+        return None
+
+    def _target_pane(self, event):
+        pane = self.pane_at(event.inaxes) if event.inaxes is not None else None
+        if pane is not None:
+            self.active_pane = pane
+        return self.active_pane
+
+    def _others(self, viewer):
+        return [other for other in self.panes.values() if other is not viewer]
+
+    def scroll(self, viewer, step):
+        before = viewer.current_dicom_index
+        if step > 0:
+            viewer.next_dicom()
+        else:
+            viewer.prev_dicom()
+        if self.sync_scroll and viewer.current_dicom_index != before:
+            position = viewer.current_position()
+            for other in self._others(viewer):
+                # go_to_position only updates panes whose slice actually changes; the figure draw is shared
+                other.go_to_position(position)
+
+    def adjust_window(self, viewer, action):
+        action(viewer)
+        if self.sync_window and viewer.studies:
+            study = viewer.studies[viewer.current_study_index]
+            window = (study["window_width"], study["window_center"])
+            for other in self._others(viewer):
+                if other.studies and (other.studies[other.current_study_index]["window_width"], other.studies[other.current_study_index]["window_center"]) != window:
+                    other.set_window(*window)
+
+    def close(self):
+        for viewer in self.panes.values():
+            viewer.close()
+        if self in self.instances:
+            self.instances.remove(self)
+
+    def on_close(self, event):
+        self.close()
+
+    def on_click(self, event):
+        self._target_pane(event)
+
+    def on_scroll(self, event):
+        viewer = self._target_pane(event)
+        if viewer is None:
+            return
+        if event.button == 'down':
+            self.scroll(viewer, 1)
+        elif event.button == 'up':
+            self.scroll(viewer, -1)
+
+    def on_key(self, event):
+        viewer = self._target_pane(event)
+        if viewer is None:
+            return
+        if event.key == 'down':
+            self.scroll(viewer, 1)
+        elif event.key == 'up':
+            self.scroll(viewer, -1)
+        elif event.key == 'i':
+            self.adjust_window(viewer, DicomViewer.increase_window_width)
+        elif event.key == 'k':
+            self.adjust_window(viewer, DicomViewer.decrease_window_width)
+        elif event.key == 'j':
+            self.adjust_window(viewer, DicomViewer.increase_window_center)
+        elif event.key == 'l':
+            self.adjust_window(viewer, DicomViewer.decrease_window_center)
+        elif event.key == 'r' and viewer.studies:
+            viewer.start_roi("rectangle")
+        elif event.key == 'e' and viewer.studies:
+            viewer.start_roi("ellipse")
@@ -0,0 +1,310 @@
+"""
+Local on-disk cache tier for series stored on slow (network) storage.
+
+When a series is opened it is transcoded once into a compact local copy:
+the folder's header index as JSON, plus the decoded slices grouped into
+chunks that are compressed losslessly (zstd when the ``zstandard`` package
+is installed, zlib otherwise). Later opens read headers and pixels from the
+local copy without touching the original files. The cache is bounded by a
+disk budget; the least recently opened series are evicted first.
+
+Every header entry and cached slice records the modification time and size
+of its source file, so a file that is overwritten in place is read again
+from the original instead of being served stale from the cache.
+
+Layout::
+
+    <root>/<folder key>/index.json
+    <root>/<folder key>/series_<number>/manifest.json
+    <root>/<folder key>/series_<number>/chunk_<generation>_0000.bin
+
+Each transcode of a series writes chunks under a new generation name and
+switches the manifest over last, so readers holding the previous manifest
+never pair its offsets with new chunk bytes.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+import zlib
+
+import numpy as np
+
+from .slice_cache import file_stamp, is_current, shared_header_index, shared_slice_cache
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bumped whenever header entries gain fields, so older stored indexes are rebuilt
+INDEX_VERSION = 3
+
+
+def _compress(data, codec, level):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return zlib.compress(data, level)
+
+
+def _decompress(data, codec):
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _shuffle(data, itemsize):
+    """Group the n-th byte of every sample together (blosc-style), which compresses 12/16-bit pixels far better."""
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if itemsize <= 1:
+        return raw
+    return np.concatenate([raw[i::itemsize] for i in range(itemsize)])
+
+
+def _unshuffle(data, itemsize):
+    """Inverse of ``_shuffle``, returned as a flat uint8 array so slices can be viewed without copying."""
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if itemsize <= 1:
+        return raw
+    count = len(raw) // itemsize
+    out = np.empty_like(raw)
+    for i in range(itemsize):
+        out[i::itemsize] = raw[i * count:(i + 1) * count]
+    return out
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp_path, path)
+
+
+def _is_current(folder_path, slice_info):
+    try:
+        stat = os.stat(os.path.join(folder_path, slice_info["file_name"]))
+    except OSError:
+        return False
+    return is_current(slice_info, stat)
+
+
+def _directory_size(path):
+    total = 0
+    for name in os.listdir(path):
+        file_path = os.path.join(path, name)
+        if os.path.isfile(file_path):
+            total += os.path.getsize(file_path)
+    return total
+
+
+class LocalSeriesCache:
+    def __init__(self, root, max_bytes=2 * 1024 ** 3, chunk_size=16, compression_level=1):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.compression_level = compression_level
+        self.codec = "zstd" if zstandard is not None else "zlib"
+        self._locations = {}
+        self._ingesting = set()
+        self._lock = threading.RLock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _folder_dir(self, folder_path):
+        key = hashlib.sha1(os.path.abspath(folder_path).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.root, key)
+
+    def _series_dir(self, folder_path, series_number):
+        return os.path.join(self._folder_dir(folder_path), f"series_{series_number}")
+
+    # Header index
+
+    def load_index(self, folder_path):
+        """Return the stored header entries of a folder, or None if it was never indexed."""
+        index_path = os.path.join(self._folder_dir(folder_path), "index.json")
+        try:
+            with open(index_path, "r", encoding="utf-8") as fh:
+                payload = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if payload.get("version") != INDEX_VERSION:
+            return None
+        return payload.get("entries")
+
+    def store_index(self, folder_path, entries):
+        folder_dir = self._folder_dir(folder_path)
+        os.makedirs(folder_dir, exist_ok=True)
+        payload = {"version": INDEX_VERSION, "folder_path": os.path.abspath(folder_path), "entries": entries}
+        _write_atomic(os.path.join(folder_dir, "index.json"), json.dumps(payload).encode("utf-8"))
+
+    # Pixel data
+
+    def _read_manifest(self, series_dir):
+        try:
+            with open(os.path.join(series_dir, "manifest.json"), "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _folder_locations(self, folder_path):
+        """Map file name -> (series dir, chunk entry, slice entry) for every cached slice of a folder."""
+        folder_dir = self._folder_dir(folder_path)
+        with self._lock:
+            locations = self._locations.get(folder_dir)
+            if locations is not None:
+                return locations
+            locations = {}
+            if os.path.isdir(folder_dir):
+                for name in os.listdir(folder_dir):
+                    series_dir = os.path.join(folder_dir, name)
+                    if not name.startswith("series_") or not os.path.isdir(series_dir):
+                        continue
+                    manifest = self._read_manifest(series_dir)
+                    if manifest is None:
+                        continue
+                    for chunk in manifest["chunks"]:
+                        for slice_info in chunk["slices"]:
+                            locations[slice_info["file_name"]] = (series_dir, chunk, slice_info)
+            self._locations[folder_dir] = locations
+            return locations
+
+    def has_series(self, folder_path, file_names):
+        """True if every file is cached and unchanged since it was cached."""
+        locations = self._folder_locations(folder_path)
+        return all(file_name in locations and _is_current(folder_path, locations[file_name][2]) for file_name in file_names)
+
+    def read_chunk(self, file_path):
+        """
+        Return ``{file_name: array}`` for the chunk holding ``file_path``, or None if it is not cached.
+
+        The whole chunk is returned so neighbouring slices can go straight to
+        the memory cache. Slices whose file changed since it was cached are
+        left out, and None is returned if ``file_path`` itself changed.
+        """
+        folder_path, file_name = os.path.split(os.path.abspath(file_path))
+        location = self._folder_locations(folder_path).get(file_name)
+        if location is None or not _is_current(folder_path, location[2]):
+            return None
+        series_dir, chunk, _ = location
+        current = [slice_info for slice_info in chunk["slices"] if slice_info["file_name"] == file_name or _is_current(folder_path, slice_info)]
+        try:
+            with open(os.path.join(series_dir, chunk["file"]), "rb") as fh:
+                data = _unshuffle(_decompress(fh.read(), chunk["codec"]), chunk.get("itemsize", 1))
+            os.utime(os.path.join(series_dir, "manifest.json"))
+        except OSError:
+            # Evicted, or replaced by a newer transcode; fall back to the original file
+            with self._lock:
+                self._locations.pop(os.path.dirname(series_dir), None)
+            return None
+        slices = {}
+        for slice_info in current:
+            buffer = data[slice_info["offset"]:slice_info["offset"] + slice_info["nbytes"]]
+            # Copied so each cached slice owns exactly its own bytes instead of pinning the whole chunk
+            slices[slice_info["file_name"]] = buffer.view(slice_info["dtype"]).reshape(slice_info["shape"]).copy()
+        return slices
+
+    def ingest_series(self, folder_path, series_number, file_names, decode):
+        """
+        Transcode a series into the cache.
+
+        ``decode`` maps a file path to its pixel array. Slices are stored in
+        ``chunk_size`` groups in the given order, so pass them sorted by
+        instance number to keep neighbouring slices in the same chunk.
+        """
+        series_dir = self._series_dir(folder_path, series_number)
+        with self._lock:
+            if series_dir in self._ingesting or self.has_series(folder_path, file_names):
+                return False
+            self._ingesting.add(series_dir)
+        try:
+            os.makedirs(series_dir, exist_ok=True)
+            generation = uuid.uuid4().hex[:12]
+            chunks = []
+            for start in range(0, len(file_names), self.chunk_size):
+                chunk_names = file_names[start:start + self.chunk_size]
+                chunk_file = f"chunk_{generation}_{start // self.chunk_size:04d}.bin"
+                slices = []
+                buffers = []
+                offset = 0
+                for file_name in chunk_names:
+                    file_path = os.path.join(folder_path, file_name)
+                    # Stat before decoding, so a file rewritten meanwhile is detected as changed later
+                    stamp = file_stamp(os.stat(file_path))
+                    image = np.ascontiguousarray(decode(file_path))
+                    slices.append({"file_name": file_name, "dtype": image.dtype.str, "shape": list(image.shape), "offset": offset, "nbytes": image.nbytes, **stamp})
+                    buffers.append(image.tobytes())
+                    offset += image.nbytes
+                # Shuffle by the widest sample so mixed-dtype chunks still round-trip
+                itemsize = max(np.dtype(slice_info["dtype"]).itemsize for slice_info in slices)
+                data = b"".join(buffers)
+                if len(data) % itemsize:
+                    itemsize = 1
+                _write_atomic(os.path.join(series_dir, chunk_file), _compress(_shuffle(data, itemsize), self.codec, self.compression_level))
+                chunks.append({"file": chunk_file, "codec": self.codec, "itemsize": itemsize, "slices": slices})
+            manifest = {"folder_path": os.path.abspath(folder_path), "series_number": str(series_number), "chunks": chunks}
+            _write_atomic(os.path.join(series_dir, "manifest.json"), json.dumps(manifest).encode("utf-8"))
+            # Drop the previous generation; readers still holding its manifest fail to open it and fall back to the original file
+            chunk_files = {chunk["file"] for chunk in chunks}
+            for name in os.listdir(series_dir):
+                if name.startswith("chunk_") and name.endswith(".bin") and name not in chunk_files:
+                    try:
+                        os.remove(os.path.join(series_dir, name))
+                    except OSError:
+                        # Still open by a reader on Windows; the next transcode removes it
+                        pass
+            with self._lock:
+                self._locations.pop(self._folder_dir(folder_path), None)
+        finally:
+            with self._lock:
+                self._ingesting.discard(series_dir)
+        self.evict(keep=series_dir)
+        return True
+
+    # Disk budget
+
+    def _cached_series(self):
+        series = []
+        for folder_name in os.listdir(self.root):
+            folder_dir = os.path.join(self.root, folder_name)
+            if not os.path.isdir(folder_dir):
+                continue
+            for name in os.listdir(folder_dir):
+                series_dir = os.path.join(folder_dir, name)
+                manifest_path = os.path.join(series_dir, "manifest.json")
+                if name.startswith("series_") and os.path.isfile(manifest_path):
+                    series.append((os.path.getmtime(manifest_path), _directory_size(series_dir), series_dir))
+        return series
+
+    @property
+    def nbytes(self):
+        return sum(size for _, size, _ in self._cached_series())
+
+    def evict(self, keep=None):
+        """Delete least recently opened series until the cache fits in ``max_bytes``."""
+        with self._lock:
+            series = sorted(self._cached_series())
+            total = sum(size for _, size, _ in series)
+            for _, size, series_dir in series:
+                if total <= self.max_bytes:
+                    break
+                if series_dir == keep or series_dir in self._ingesting:
+                    continue
+                shutil.rmtree(series_dir, ignore_errors=True)
+                self._locations.pop(os.path.dirname(series_dir), None)
+                total -= size
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.root):
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            self._locations.clear()
+
+
+def enable_local_cache(root, max_bytes=2 * 1024 ** 3):
+    """Attach a local cache tier to the shared header index and slice cache. Returns the cache."""
+    local_cache = LocalSeriesCache(root, max_bytes=max_bytes)
+    shared_header_index.local_cache = local_cache
+    shared_slice_cache.local_cache = local_cache
+    return local_cache
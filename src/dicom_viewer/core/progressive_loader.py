@@ -0,0 +1,137 @@
+"""
+Background slice decoding for progressive display.
+
+The viewer shows a cached low-resolution proxy straight away and asks the
+loader for the full slice. Decodes run on worker threads and feed the shared
+SliceCache; finished slices are handed back to the GUI thread through
+``poll``; decodes that fail are reported through ``poll_failures``.
+Requests the user has already scrolled past are cancelled before they start.
+
+A separate low-priority thread fills the cache's proxy tier for the rest of
+the study, nearest slices first, so a first pass through a series already
+has something to show while the full slice decodes. It pauses while
+foreground decodes are pending, and keeps the full slice for the nearest
+paths, which the user is about to reach anyway.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ProgressiveLoader:
+    def __init__(self, slice_cache, max_workers=2):
+        self.slice_cache = slice_cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dicom-decode")
+        self._pending = {}
+        self._done = []
+        self._failed = {}
+        # Re-entrant: a future that is already done runs its callback inside request()
+        self._lock = threading.RLock()
+        self._proxy_queue = []
+        self._proxy_keep_full = 0
+        self._proxy_wakeup = threading.Event()
+        self._closed = False
+        self._proxy_thread = threading.Thread(target=self._fill_proxies, name="dicom-proxy", daemon=True)
+        self._proxy_thread.start()
+
+    def _decode(self, file_path):
+        try:
+            image = self.slice_cache.get(file_path)
+        except Exception as e:
+            with self._lock:
+                self._failed[file_path] = e
+            raise
+        with self._lock:
+            self._done.append(file_path)
+        return image
+
+    def request(self, file_path, prefetch=()):
+        """
+        Queue ``file_path`` for decoding, followed by the ``prefetch`` paths.
+
+        Anything still queued that is not part of this request is stale and
+        gets cancelled. Decodes already running are left to finish, since
+        their result still lands in the cache.
+        """
+        wanted = [file_path] + [path for path in prefetch if path != file_path]
+        with self._lock:
+            for path, future in list(self._pending.items()):
+                if path not in wanted and future.cancel():
+                    del self._pending[path]
+            for path in wanted:
+                if path in self._pending or self.slice_cache.peek(path) is not None:
+                    continue
+                future = self._executor.submit(self._decode, path)
+                # Register before attaching the callback: a decode that already finished runs it right here
+                self._pending[path] = future
+                future.add_done_callback(lambda _, path=path: self._forget(path))
+
+    def request_proxies(self, file_paths, keep_full=0):
+        """
+        Replace the low-priority queue of slices to prepare proxies for, most urgent first.
+
+        The first ``keep_full`` paths are decoded into the full-resolution tier
+        too, so slices about to be shown are not decoded a second time.
+        """
+        with self._lock:
+            self._proxy_queue = list(reversed(file_paths))
+            self._proxy_keep_full = keep_full
+            self._proxy_wakeup.set()
+
+    def _fill_proxies(self):
+        while True:
+            self._proxy_wakeup.wait()
+            with self._lock:
+                if self._closed:
+                    return
+                # Foreground decodes go first; _forget wakes this thread when they are done
+                if not self._proxy_queue or self._pending:
+                    self._proxy_wakeup.clear()
+                    continue
+                file_path = self._proxy_queue.pop()
+                keep_full = self._proxy_keep_full > 0
+                self._proxy_keep_full -= 1
+            try:
+                if keep_full:
+                    self.slice_cache.get(file_path)
+                else:
+                    self.slice_cache.get_proxy(file_path)
+            except Exception:
+                # Unreadable files are reported by the full decode when the user reaches them
+                pass
+
+    def _forget(self, file_path):
+        with self._lock:
+            self._pending.pop(file_path, None)
+            if not self._pending:
+                self._proxy_wakeup.set()
+
+    def is_pending(self, file_path):
+        with self._lock:
+            return file_path in self._pending
+
+    @property
+    def busy(self):
+        with self._lock:
+            return bool(self._pending) or bool(self._done) or bool(self._failed)
+
+    def poll(self):
+        """Return the paths decoded since the last call. Call this from the GUI thread."""
+        with self._lock:
+            done, self._done = self._done, []
+        return done
+
+    def poll_failures(self):
+        """Return ``{path: exception}`` for decodes that failed since the last call. Call this from the GUI thread."""
+        with self._lock:
+            failed, self._failed = self._failed, {}
+        return failed
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            self._proxy_queue = []
+            self._proxy_wakeup.set()
+            for future in self._pending.values():
+                future.cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,273 @@
+"""
+Region-of-interest measurements.
+
+An ROI (rectangle or ellipse, in pixel coordinates) is applied to every
+slice of a range and measured on the rescaled (HU) values: mean, standard
+deviation, min/max, a histogram and the enclosed volume in mL. The slices
+are gathered once as stored pixel values (shared with the slice cache);
+each measurement crops them to the ROI bounding box and only rescales that
+crop, so measurements are cheap enough to redo while the ROI is dragged.
+
+``RoiTool`` draws the ROI on a ``DicomViewer`` figure; ``measure_series``
+and ``measure_series_batch`` are the headless equivalents.
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.widgets import EllipseSelector, RectangleSelector
+
+from .slice_cache import shared_header_index, shared_slice_cache
+
+HU_RANGE = (-1024, 3072)
+
+
+class ROI:
+    """
+    Rectangle or ellipse inscribed in ``extents = (xmin, xmax, ymin, ymax)``.
+
+    Coordinates are pixel columns (x) and rows (y), the same convention as
+    matplotlib selector extents on an ``imshow`` image. A pixel belongs to the
+    ROI when its centre does.
+    """
+
+    SHAPES = ("rectangle", "ellipse")
+
+    def __init__(self, shape, extents):
+        if shape not in self.SHAPES:
+            raise ValueError(f"Unknown ROI shape {shape!r}, expected one of {self.SHAPES}")
+        xmin, xmax, ymin, ymax = (float(v) for v in extents)
+        self.shape = shape
+        self.extents = (min(xmin, xmax), max(xmin, xmax), min(ymin, ymax), max(ymin, ymax))
+
+    def __repr__(self):
+        return f"ROI({self.shape!r}, {self.extents})"
+
+    def mask(self, rows, columns):
+        """Return ``(row_slice, column_slice, mask)`` with the mask cropped to the ROI bounding box."""
+        xmin, xmax, ymin, ymax = self.extents
+        row_slice = slice(max(int(np.ceil(ymin)), 0), min(int(np.floor(ymax)) + 1, rows))
+        column_slice = slice(max(int(np.ceil(xmin)), 0), min(int(np.floor(xmax)) + 1, columns))
+        y = np.arange(row_slice.start, max(row_slice.stop, row_slice.start))[:, None]
+        x = np.arange(column_slice.start, max(column_slice.stop, column_slice.start))[None, :]
+        if self.shape == "rectangle":
+            mask = np.ones((y.shape[0], x.shape[1]), dtype=bool)
+        else:
+            cx, cy = (xmin + xmax) / 2, (ymin + ymax) / 2
+            rx, ry = max((xmax - xmin) / 2, 1e-6), max((ymax - ymin) / 2, 1e-6)
+            mask = ((x - cx) / rx) ** 2 + ((y - cy) / ry) ** 2 <= 1
+        return row_slice, column_slice, mask
+
+
+def series_entries(folder_path, series_number, thickness, header_index=None):
+    """Header entries of one series and thickness, ordered by instance number."""
+    header_index = header_index if header_index is not None else shared_header_index
+    thickness = float(thickness) if thickness is not None else None
+    entries = [entry for entry in header_index.series_files(folder_path, series_number) if entry["thickness"] == thickness]
+    entries.sort(key=lambda entry: (entry["instance_number"] is None, entry["instance_number"] or 0))
+    return entries
+
+
+def load_volume(folder_path, file_names, header_index=None, slice_cache=None):
+    """
+    Gather the given slices for measurement, without rescaling them.
+
+    Returns a dict with ``images`` (the stored pixel arrays, as kept by the
+    slice cache), per-slice ``slopes`` and ``intercepts`` for the HU rescale,
+    ``shape`` (rows, columns) and ``spacing`` (slice, row, column) in mm;
+    spacing values are None when the headers do not provide them.
+    """
+    header_index = header_index if header_index is not None else shared_header_index
+    slice_cache = slice_cache if slice_cache is not None else shared_slice_cache
+    entries = header_index.scan(folder_path)
+    if not file_names:
+        raise ValueError("No slices to measure")
+    images = []
+    for file_name in file_names:
+        image = slice_cache.get(os.path.join(folder_path, file_name))
+        if images and image.shape != images[0].shape:
+            raise ValueError(f"Slice {file_name} is {image.shape}, expected {images[0].shape}")
+        images.append(image)
+    slopes = np.array([entries[name].get("rescale_slope", 1.0) for name in file_names], dtype=np.float32)
+    intercepts = np.array([entries[name].get("rescale_intercept", 0.0) for name in file_names], dtype=np.float32)
+
+    first_entry = entries[file_names[0]]
+    pixel_spacing = first_entry.get("pixel_spacing") or [None, None]
+    positions = [entries[name]["position"] for name in file_names]
+    if len(file_names) > 1 and None not in positions:
+        slice_spacing = float(np.median(np.abs(np.diff(positions)))) or first_entry["thickness"]
+    else:
+        slice_spacing = first_entry["thickness"]
+    return {"images": images, "slopes": slopes, "intercepts": intercepts, "shape": images[0].shape[:2],
+            "spacing": (slice_spacing, pixel_spacing[0], pixel_spacing[1]), "files": list(file_names)}
+
+
+def roi_statistics(volume, roi, bins=256, hu_range=HU_RANGE):
+    """Mean/std/min/max, histogram and volume of the ROI over every slice of ``volume``."""
+    row_slice, column_slice, mask = roi.mask(*volume["shape"])
+    # Only the bounding-box crop of each slice is converted to HU
+    hu = np.stack([image[row_slice, column_slice] for image in volume["images"]]).astype(np.float32)
+    hu *= volume["slopes"][:, None, None]
+    hu += volume["intercepts"][:, None, None]
+    values = hu[:, mask]
+    count = int(values.size)
+    counts, edges = np.histogram(values, bins=bins, range=hu_range)
+    spacing = volume["spacing"]
+    voxel_ml = float(np.prod(spacing)) / 1000 if None not in spacing else None
+    result = {
+        "roi": {"shape": roi.shape, "extents": list(roi.extents)},
+        "slices": hu.shape[0],
+        "count": count,
+        "mean": float(values.mean(dtype=np.float64)) if count else None,
+        "std": float(values.std(dtype=np.float64)) if count else None,
+        "min": float(values.min()) if count else None,
+        "max": float(values.max()) if count else None,
+        "volume_ml": count * voxel_ml if voxel_ml is not None else None,
+        "histogram": {"counts": counts.tolist(), "bin_edges": edges.tolist()},
+    }
+    return result
+
+
+def measure_series(folder_path, series_number, thickness, roi, slice_range=None, bins=256, hu_range=HU_RANGE):
+    """Measure ``roi`` over a series (optionally a ``(start, stop)`` range of its slices)."""
+    entries = series_entries(folder_path, series_number, thickness)
+    if slice_range is not None:
+        entries = entries[slice(*slice_range)]
+    volume = load_volume(folder_path, [entry["file_name"] for entry in entries])
+    result = roi_statistics(volume, roi, bins, hu_range)
+    result.update({"folder_path": folder_path, "series_number": str(series_number), "thickness": thickness})
+    return result
+
+
+def _measure_job(job):
+    folder_path, series_number, thickness, roi, slice_range, bins, hu_range = job
+    try:
+        return measure_series(folder_path, series_number, thickness, roi, slice_range, bins, hu_range)
+    except Exception as e:
+        return {"folder_path": folder_path, "series_number": str(series_number), "thickness": thickness, "error": str(e)}
+
+
+def measure_series_batch(series, roi, slice_range=None, bins=256, hu_range=HU_RANGE, max_workers=None):
+    """
+    Measure the same ROI on many ``(folder_path, series_number, thickness)`` series in parallel processes.
+
+    Results come back in input order; a series that fails yields a dict with an ``error`` key.
+    """
+    jobs = [(folder_path, series_number, thickness, roi, slice_range, bins, hu_range) for folder_path, series_number, thickness in series]
+    if max_workers == 1 or len(jobs) <= 1:
+        return [_measure_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_measure_job, jobs))
+
+
+class RoiTool:
+    """
+    Interactive ROI on a ``DicomViewer``.
+
+    Drawing or dragging the ROI re-measures it over ``slice_range`` of the
+    current study (the whole study by default). The slices are gathered once,
+    on a background thread when the first ROI is drawn, and each update then
+    only rescales the ROI bounding box. Results are shown on the image,
+    optionally plotted as a histogram on ``hist_ax``, and passed to
+    ``on_update``.
+    """
+
+    def __init__(self, viewer, shape="rectangle", slice_range=None, bins=256, hist_ax=None, on_update=None):
+        if shape not in ROI.SHAPES:
+            raise ValueError(f"Unknown ROI shape {shape!r}, expected one of {ROI.SHAPES}")
+        self.viewer = viewer
+        self.shape = shape
+        self.slice_range = slice_range
+        self.bins = bins
+        self.hist_ax = hist_ax
+        self.on_update = on_update
+        self.volume = None
+        self.result = None
+        self._extents = None
+        self._load_error = None
+        self._load_timer = None
+        selector_class = RectangleSelector if shape == "rectangle" else EllipseSelector
+        self.selector = selector_class(viewer.ax, self.on_select, interactive=True, useblit=False)
+        self.text = viewer.ax.text(0.02, 0.02, "", transform=viewer.ax.transAxes, color="yellow", fontsize=8, va="bottom")
+        self._cid = viewer.fig.canvas.mpl_connect('motion_notify_event', self.on_move)
+
+    def load(self):
+        study = self.viewer.studies[self.viewer.current_study_index]
+        files = study["files"][slice(*self.slice_range)] if self.slice_range is not None else study["files"]
+        self.volume = load_volume(self.viewer.folder_path, files, self.viewer.header_index, self.viewer.slice_cache)
+
+    def start_load(self):
+        """Load the slices on a worker thread; the canvas timer picks up the result on the GUI thread."""
+        self.text.set_text("Cargando cortes para la ROI...")
+        self.viewer.fig.canvas.draw_idle()
+        threading.Thread(target=self._load, daemon=True).start()
+        self._load_timer = self.viewer.fig.canvas.new_timer(interval=50)
+        self._load_timer.add_callback(self.poll_load)
+        self._load_timer.start()
+
+    def _load(self):
+        try:
+            self.load()
+        except Exception as e:
+            self._load_error = e
+
+    def poll_load(self):
+        if self.volume is None and self._load_error is None:
+            return
+        self._load_timer.stop()
+        if self._load_error is not None:
+            self.text.set_text(f"Error al cargar los cortes de la ROI: {self._load_error}")
+            self.viewer.fig.canvas.draw_idle()
+            return
+        # Measure the ROI as it is now; it may have moved while the slices loaded
+        extents, self._extents = self._extents, None
+        self.update(extents)
+
+    def on_select(self, eclick, erelease):
+        self.update(self.selector.extents)
+
+    def on_move(self, event):
+        # Follow the ROI while it is being drawn or dragged
+        if event.button is not None and event.inaxes is self.viewer.ax:
+            self.update(self.selector.extents)
+
+    def update(self, extents):
+        extents = tuple(float(v) for v in extents)
+        if extents == self._extents or extents[1] - extents[0] < 1 or extents[3] - extents[2] < 1:
+            return
+        self._extents = extents
+        if self.volume is None:
+            if self._load_timer is None:
+                self.start_load()
+            return
+        self.result = roi_statistics(self.volume, ROI(self.shape, extents), self.bins)
+        self.draw()
+        if self.on_update is not None:
+            self.on_update(self.result)
+
+    def draw(self):
+        result = self.result
+        if result["count"] == 0:
+            self.text.set_text("ROI vacía")
+        else:
+            volume = f", {result['volume_ml']:.2f} mL" if result["volume_ml"] is not None else ""
+            self.text.set_text(f"ROI {result['slices']} cortes: media {result['mean']:.1f} HU, DE {result['std']:.1f}, "
+                               f"min {result['min']:.0f}, max {result['max']:.0f}{volume}")
+        if self.hist_ax is not None:
+            edges = result["histogram"]["bin_edges"]
+            self.hist_ax.clear()
+            self.hist_ax.stairs(result["histogram"]["counts"], edges)
+            self.hist_ax.set_xlabel("HU")
+            self.hist_ax.figure.canvas.draw_idle()
+        self.viewer.fig.canvas.draw_idle()
+
+    def remove(self):
+        if self._load_timer is not None:
+            self._load_timer.stop()
+        self.selector.set_active(False)
+        self.selector.set_visible(False)
+        self.viewer.fig.canvas.mpl_disconnect(self._cid)
+        self.text.remove()
+        self.viewer.fig.canvas.draw_idle()
@@ -0,0 +1,312 @@
+"""
+Shared header index and decoded-slice cache.
+
+Viewers opened on the same folder (several panes of a hanging layout, or
+separate study windows) share one header scan and one pool of decoded
+pixel arrays instead of each re-reading every file.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pydicom
+
+
+def window_from_dataset(ds):
+    """Return the (window_width, window_center) stored in a dataset, or the 8-bit default."""
+    if hasattr(ds, 'WindowWidth') and isinstance(ds.WindowWidth, pydicom.multival.MultiValue) and hasattr(ds, 'WindowCenter') and isinstance(ds.WindowCenter, pydicom.multival.MultiValue):
+        return float(ds.WindowWidth[0]), float(ds.WindowCenter[0])
+    elif hasattr(ds, 'WindowWidth') and hasattr(ds, 'WindowCenter'):
+        return float(ds.WindowWidth), float(ds.WindowCenter)
+    return 255, 127.5
+
+
+def slice_position(ds):
+    """
+    Position of a slice along its normal, in patient millimetres.
+
+    Uses ImagePositionPatient projected on the ImageOrientationPatient normal,
+    falling back to SliceLocation. Returns None when neither is present.
+    """
+    position = ds.get("ImagePositionPatient")
+    orientation = ds.get("ImageOrientationPatient")
+    if position is not None and orientation is not None and len(orientation) == 6:
+        row = np.array([float(v) for v in orientation[:3]])
+        col = np.array([float(v) for v in orientation[3:]])
+        normal = np.cross(row, col)
+        return float(np.dot(normal, [float(v) for v in position]))
+    location = ds.get("SliceLocation")
+    if location is not None:
+        return float(location)
+    return None
+
+
+def _optional(value, cast):
+    return cast(value) if value is not None else None
+
+
+def file_stamp(stat):
+    """Modification time and size of a file, stored with cached data to detect overwritten files."""
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def is_current(record, stat):
+    """True if ``record`` (a header entry or cached slice) was taken from the file as it is now."""
+    return record.get("mtime_ns") == stat.st_mtime_ns and record.get("size") == stat.st_size
+
+
+def header_entry(file_name, ds, stat=None):
+    """
+    Build the header index entry for one dataset read without pixel data.
+
+    Values are plain Python types so entries can be stored as JSON by the local cache tier.
+    With the file's ``os.stat`` result the entry also records its modification time and size.
+    """
+    window_width, window_center = window_from_dataset(ds)
+    entry = {
+        "file_name": file_name,
+        "series_number": str(ds.get("SeriesNumber")),
+        "series_description": _optional(ds.get("SeriesDescription"), str),
+        "thickness": _optional(ds.get("SliceThickness"), float),
+        "instance_number": _optional(ds.get("InstanceNumber"), int),
+        "window_width": window_width,
+        "window_center": window_center,
+        "position": slice_position(ds),
+        "rows": _optional(ds.get("Rows"), int),
+        "columns": _optional(ds.get("Columns"), int),
+        "pixel_spacing": _optional(ds.get("PixelSpacing"), lambda spacing: [float(v) for v in spacing]),
+        "rescale_slope": float(ds.get("RescaleSlope", 1) or 1),
+        "rescale_intercept": float(ds.get("RescaleIntercept", 0) or 0),
+    }
+    if stat is not None:
+        entry.update(file_stamp(stat))
+    return entry
+
+
+class HeaderIndex:
+    """
+    Per-folder index of DICOM headers.
+
+    Each folder is scanned once with ``stop_before_pixels``; later calls only
+    list the folder and read headers of files that appeared or whose
+    modification time or size changed since. With a ``local_cache`` the index
+    survives restarts and is only rebuilt for new or modified files.
+    """
+
+    def __init__(self, local_cache=None):
+        self.local_cache = local_cache
+        self._folders = {}
+        self._lock = threading.Lock()
+
+    def scan(self, folder_path):
+        """Return a dict mapping each ``.dcm`` file name in the folder to its header entry."""
+        folder_path = os.path.abspath(folder_path)
+        with os.scandir(folder_path) as listing:
+            stats = {item.name: item.stat() for item in listing if item.name.endswith('.dcm')}
+        with self._lock:
+            known = self._folders.get(folder_path)
+        if known is None:
+            known = (self.local_cache.load_index(folder_path) if self.local_cache is not None else None) or {}
+        missing = [name for name, stat in stats.items() if name not in known or not is_current(known[name], stat)]
+        entries = {name: known[name] for name in stats if name in known and name not in missing}
+        for file_name in missing:
+            ds = pydicom.dcmread(os.path.join(folder_path, file_name), stop_before_pixels=True)
+            entries[file_name] = header_entry(file_name, ds, stats[file_name])
+        with self._lock:
+            self._folders[folder_path] = entries
+        if self.local_cache is not None and (missing or len(entries) != len(known)):
+            self.local_cache.store_index(folder_path, entries)
+        return entries
+
+    def series_files(self, folder_path, series_number):
+        """Header entries of the given series, in folder listing order."""
+        return [entry for entry in self.scan(folder_path).values() if entry["series_number"] == str(series_number)]
+
+    def forget(self, folder_path):
+        with self._lock:
+            self._folders.pop(os.path.abspath(folder_path), None)
+
+
+class _LRUStore:
+    """Size-bounded LRU mapping of keys to numpy arrays. Not locked; callers hold the cache lock."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.size = 0
+
+    def peek(self, key):
+        image = self.items.get(key)
+        if image is not None:
+            self.items.move_to_end(key)
+        return image
+
+    def put(self, key, image):
+        previous = self.items.pop(key, None)
+        if previous is not None:
+            self.size -= previous.nbytes
+        self.items[key] = image
+        self.size += image.nbytes
+        while self.size > self.max_bytes and len(self.items) > 1:
+            _, evicted = self.items.popitem(last=False)
+            self.size -= evicted.nbytes
+
+    def clear(self):
+        self.items.clear()
+        self.size = 0
+
+
+def downsample(image, factor):
+    """Cheap low-resolution proxy of a slice by block averaging."""
+    if factor <= 1:
+        return image
+    rows = image.shape[0] // factor * factor
+    cols = image.shape[1] // factor * factor
+    if rows == 0 or cols == 0:
+        return np.ascontiguousarray(image[::factor, ::factor])
+    # Sum row blocks, then add strided column views: same result as a 4-D mean, several times faster
+    row_sums = image[:rows, :cols].reshape(rows // factor, factor, cols, *image.shape[2:]).sum(axis=1, dtype=np.float32)
+    total = row_sums[:, 0::factor].copy()
+    for offset in range(1, factor):
+        total += row_sums[:, offset::factor]
+    total /= factor * factor
+    return total.astype(image.dtype)
+
+
+class SliceCache:
+    """
+    Thread-safe LRU cache of decoded pixel arrays, keyed by file path,
+    modification time and size, so a file overwritten in place is decoded again.
+
+    ``max_bytes`` bounds the total size of the cached full-resolution arrays;
+    the least recently used slices are dropped first. Every decoded slice
+    also leaves a ``proxy_factor`` times downsampled proxy in a separate,
+    smaller tier, so a slice evicted from the full tier can still be shown
+    at low resolution while it is decoded again. ``get_proxy`` fills that
+    tier ahead of display for slices that were never decoded.
+
+    With a ``local_cache`` (see ``local_cache.LocalSeriesCache``) misses are
+    served from the local transcoded copy before falling back to the original file.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024, proxy_max_bytes=64 * 1024 * 1024, proxy_factor=4, local_cache=None):
+        self.local_cache = local_cache
+        self.proxy_factor = proxy_factor
+        self._slices = _LRUStore(max_bytes)
+        self._proxies = _LRUStore(proxy_max_bytes)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(file_path):
+        """``(absolute path, st_mtime_ns, st_size)``, or None if the file cannot be stat'ed."""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size
+
+    def _lookup(self, store, key):
+        if key is None:
+            return None
+        with self._lock:
+            return store.peek(key)
+
+    def _store(self, key, image):
+        proxy = downsample(image, self.proxy_factor)
+        with self._lock:
+            self._slices.put(key, image)
+            self._proxies.put(key, proxy)
+
+    def __contains__(self, file_path):
+        key = self._key(file_path)
+        with self._lock:
+            return key in self._slices.items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._slices.items)
+
+    @property
+    def max_bytes(self):
+        return self._slices.max_bytes
+
+    @property
+    def nbytes(self):
+        return self._slices.size
+
+    def peek(self, file_path):
+        """Return the cached array for ``file_path`` without decoding, or None."""
+        return self._lookup(self._slices, self._key(file_path))
+
+    def peek_proxy(self, file_path):
+        """Return the low-resolution proxy for ``file_path`` if one is cached, or None."""
+        return self._lookup(self._proxies, self._key(file_path))
+
+    def get_proxy(self, file_path):
+        """
+        Return the proxy for ``file_path``, decoding the slice on a miss.
+
+        The decoded slice is kept in the full-resolution tier only if it fits
+        without evicting anything, so filling the proxy tier ahead of display
+        never pushes out slices that are already cached.
+        """
+        key = self._key(file_path)
+        proxy = self._lookup(self._proxies, key)
+        if proxy is not None:
+            return proxy
+        image = self._lookup(self._slices, key)
+        if image is None:
+            image = pydicom.dcmread(file_path).pixel_array
+        proxy = downsample(image, self.proxy_factor)
+        if key is not None:
+            with self._lock:
+                if key not in self._slices.items and self._slices.size + image.nbytes <= self._slices.max_bytes:
+                    self._slices.put(key, image)
+                self._proxies.put(key, proxy)
+        return proxy
+
+    def put(self, file_path, image):
+        key = self._key(file_path)
+        if key is not None:
+            self._store(key, image)
+
+    def get(self, file_path):
+        """Return the decoded pixel array for ``file_path``, decoding it on a miss."""
+        # Stat before reading: if the file changes meanwhile, the stored entry simply never matches again
+        key = self._key(file_path)
+        image = self._lookup(self._slices, key)
+        if image is None and key is not None and self.local_cache is not None:
+            chunk = self.local_cache.read_chunk(file_path)
+            if chunk is not None:
+                folder_path, file_name = os.path.split(key[0])
+                image = chunk.pop(file_name)
+                self._store(key, image)
+                for other_name, chunk_image in chunk.items():
+                    self.put(os.path.join(folder_path, other_name), chunk_image)
+        if image is None:
+            image = pydicom.dcmread(file_path).pixel_array
+            if key is not None:
+                self._store(key, image)
+        return image
+
+    def ingest(self, folder_path, series_number, file_names, background=True):
+        """Transcode a series into the local cache tier, if one is configured and it is not there yet."""
+        if self.local_cache is None or self.local_cache.has_series(folder_path, file_names):
+            return
+        args = (folder_path, series_number, list(file_names), self.get)
+        if background:
+            threading.Thread(target=self.local_cache.ingest_series, args=args, daemon=True).start()
+        else:
+            self.local_cache.ingest_series(*args)
+
+    def clear(self):
+        with self._lock:
+            self._slices.clear()
+            self._proxies.clear()
+
+
+# Process-wide instances used by viewers that are not given their own.
+shared_header_index = HeaderIndex()
+shared_slice_cache = SliceCache()
@@ -7,5 +7,6 @@ and preview components.
 
 from .patient_interface import patient_interface
 from .study_interface import show_series_data
+from .study_server import StudyServer, serve
 
-__all__ = ["patient_interface", "show_series_data"]
\ No newline at end of file
+__all__ = ["patient_interface", "show_series_data", "StudyServer", "serve"]
\ No newline at end of file
@@ -1,9 +1,9 @@
 import tkinter as tk
 from tkinter import Button
-import pydicom
 from PIL import Image, ImageTk
 import os
 from ..utils.series_utils import show_dicom_study, find_unique_series_numbers_and_thicknesses
+from ..core.slice_cache import shared_header_index
 import numpy as np
 
 # Lista para almacenar las referencias de las imágenes
@@ -89,16 +89,12 @@ def previewStudies(folder_path = r'D:\TFG\estudios_ct\1'):
     for series_number, data in series_data.items():
         images_for_series = []
         
-        for file_name in os.listdir(folder_path):
-            if file_name.endswith('.dcm'):
-                file_path = os.path.join(folder_path, file_name)
-                ds = pydicom.dcmread(file_path)
-                
-                if str(ds.get("SeriesNumber")) == series_number:
-                    thickness = ds.get("SliceThickness")
-                    
-                    if thickness in data['thicknesses'] or (thickness is None and not data['thicknesses']):
-                        images_for_series.append((file_path, thickness))
+        for entry in shared_header_index.series_files(folder_path, series_number):
+            file_path = os.path.join(folder_path, entry["file_name"])
+            thickness = entry["thickness"]
+            
+            if thickness in data['thicknesses'] or (thickness is None and not data['thicknesses']):
+                images_for_series.append((file_path, thickness))
         
         data['images_for_series'] = images_for_series
     
@@ -0,0 +1,323 @@
+"""
+Local study server.
+
+Serves the folder layout used by ``patient_interface`` (one sub-folder per
+patient, DICOM files inside) over HTTP, so studies can be browsed from
+other tools or machines without the desktop interface:
+
+    GET /patients
+    GET /patients/<patient>/series
+    GET /patients/<patient>/series/<series>/slices?thickness=<mm|none>
+    GET /patients/<patient>/series/<series>/thumbnail.png?thickness=<mm|none>
+    GET /patients/<patient>/series/<series>/slices/<index>.png?thickness=&ww=&wc=
+    GET /patients/<patient>/series/<series>/slices/<index>.raw?thickness=
+
+Requests are handled on a thread per connection and share the process-wide
+header index and decoded-slice cache. Image responses carry an ETag built
+from the file's modification time and size, are sent with ``no-cache`` so
+clients revalidate, and are answered with 304 when the client already has them.
+
+Run with ``python -m dicom_viewer.interfaces.study_server ROOT_FOLDER``.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+from PIL import Image
+
+from ..core.slice_cache import shared_header_index, shared_slice_cache
+from ..utils.image_utils import load_dicom_image
+from ..utils.series_utils import find_unique_series_numbers_and_thicknesses
+
+
+class NotFound(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    pass
+
+
+def window_to_uint8(image, window_width, window_center):
+    """Apply a window/level to a slice, with the same limits the viewer uses, and scale to 8 bits."""
+    vmin = window_center - 0.5 - (window_width - 1) / 2
+    vmax = window_center - 0.5 + (window_width - 1) / 2
+    scaled = (image.astype(np.float32) - vmin) * (255.0 / max(vmax - vmin, 1e-6))
+    return np.clip(scaled, 0, 255).astype(np.uint8)
+
+
+def encode_png(image):
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+class StudyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, root_folder, server_address=("127.0.0.1", 8000), header_index=None, slice_cache=None, max_rendered=1024):
+        self.root_folder = os.path.realpath(root_folder)
+        self.header_index = header_index if header_index is not None else shared_header_index
+        self.slice_cache = slice_cache if slice_cache is not None else shared_slice_cache
+        self.max_rendered = max_rendered
+        self._rendered = OrderedDict()
+        self._rendered_lock = threading.Lock()
+        self._series_entries = {}
+        self._series_lock = threading.Lock()
+        super().__init__(server_address, StudyRequestHandler)
+
+    # Data access shared by all handler threads
+
+    def patient_folder(self, patient):
+        # Only plain sub-folder names of the root are served
+        folder_path = os.path.join(self.root_folder, patient)
+        if patient in (".", "..") or os.path.basename(patient) != patient or "/" in patient or not os.path.isdir(folder_path):
+            raise NotFound(f"Unknown patient {patient!r}")
+        return folder_path
+
+    def patients(self):
+        return sorted(name for name in os.listdir(self.root_folder) if os.path.isdir(os.path.join(self.root_folder, name)))
+
+    def series(self, patient):
+        series_data = find_unique_series_numbers_and_thicknesses(self.patient_folder(patient), self.header_index)
+        return [
+            {
+                "series_number": series_number,
+                "series_description": data["series_description"],
+                "thicknesses": sorted(data["thicknesses"]),
+                "no_thickness": len(data["no_thickness"]),
+            }
+            for series_number, data in sorted(series_data.items())
+        ]
+
+    def slices(self, patient, series_number, thickness, refresh=False):
+        """
+        Header entries of one series and thickness, ordered by instance number.
+
+        The sorted list is cached per series and only rebuilt from a folder
+        scan when the folder's modification time changes (files added,
+        removed or renamed) or ``refresh`` is set, so a request does not
+        stat every file of the patient.
+        """
+        folder_path = self.patient_folder(patient)
+        folder_mtime = os.stat(folder_path).st_mtime_ns
+        key = (folder_path, str(series_number), thickness)
+        with self._series_lock:
+            cached = self._series_entries.get(key)
+        if refresh or cached is None or cached[0] != folder_mtime:
+            entries = [entry for entry in self.header_index.series_files(folder_path, series_number) if entry["thickness"] == thickness]
+            entries.sort(key=lambda entry: (entry["instance_number"] is None, entry["instance_number"] or 0))
+            cached = (folder_mtime, entries)
+            with self._series_lock:
+                self._series_entries[key] = cached
+        entries = cached[1]
+        if not entries:
+            raise NotFound(f"No slices for series {series_number} with thickness {thickness}")
+        return folder_path, entries
+
+    def slice_entry(self, patient, series_number, thickness, index):
+        """
+        Return ``(file_path, entry, version)`` for one slice, stat'ing only that file.
+
+        A file overwritten in place does not change the folder's modification
+        time, so its own stat is compared with the cached entry and the series
+        is rescanned when they differ.
+        """
+        for refresh in (False, True):
+            folder_path, entries = self.slices(patient, series_number, thickness, refresh)
+            if not 0 <= index < len(entries):
+                raise NotFound(f"Slice {index} out of range (0-{len(entries) - 1})")
+            entry = entries[index]
+            file_path = os.path.join(folder_path, entry["file_name"])
+            version = self.file_version(file_path)
+            if version == (entry.get("mtime_ns"), entry.get("size")):
+                break
+        return file_path, entry, version
+
+    def file_version(self, file_path):
+        """``(st_mtime_ns, st_size)`` of a slice file; part of every ETag and rendered-image key."""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            raise NotFound(f"Slice file {os.path.basename(file_path)} is gone")
+        return stat.st_mtime_ns, stat.st_size
+
+    def rendered(self, key, render):
+        """Return the encoded image cached under ``key``, rendering it with ``render()`` on a miss."""
+        with self._rendered_lock:
+            data = self._rendered.get(key)
+            if data is not None:
+                self._rendered.move_to_end(key)
+                return data
+        data = render()
+        with self._rendered_lock:
+            self._rendered[key] = data
+            while len(self._rendered) > self.max_rendered:
+                self._rendered.popitem(last=False)
+        return data
+
+    def thumbnail(self, file_path, version):
+        render = lambda: encode_png(np.asarray(load_dicom_image(file_path, header_index=self.header_index, slice_cache=self.slice_cache)))
+        return self.rendered((file_path, version, "thumbnail"), render)
+
+
+class StudyRequestHandler(BaseHTTPRequestHandler):
+    server_version = "DicomStudyServer/1.0"
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this keep-alive responses stall on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = [unquote(part) for part in url.path.split("/") if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            self.route(parts, query)
+        except NotFound as e:
+            self.send_json({"error": str(e)}, HTTPStatus.NOT_FOUND)
+        except BadRequest as e:
+            self.send_json({"error": str(e)}, HTTPStatus.BAD_REQUEST)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            self.send_json({"error": f"Error reading DICOM data: {e}"}, HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    def route(self, parts, query):
+        server = self.server
+        if parts == ["patients"]:
+            return self.send_json(server.patients())
+        if len(parts) < 3 or parts[0] != "patients" or parts[2] != "series":
+            raise NotFound(f"No endpoint at {self.path}")
+        patient = parts[1]
+        if len(parts) == 3:
+            return self.send_json(server.series(patient))
+        series_number = parts[3]
+        thickness = self.thickness(query)
+        if parts[4:] == ["slices"]:
+            _, entries = server.slices(patient, series_number, thickness)
+            return self.send_json([
+                {"index": index, "file_name": entry["file_name"], "instance_number": entry["instance_number"], "position": entry["position"],
+                 "rows": entry["rows"], "columns": entry["columns"], "window_width": entry["window_width"], "window_center": entry["window_center"]}
+                for index, entry in enumerate(entries)
+            ])
+        if parts[4:] == ["thumbnail.png"]:
+            file_path, _, version = server.slice_entry(patient, series_number, thickness, 0)
+            etag = self.etag(file_path, version, "thumbnail")
+            if self.not_modified(etag):
+                return
+            return self.send_body(server.thumbnail(file_path, version), "image/png", etag)
+        if len(parts) == 6 and parts[4] == "slices":
+            name, _, extension = parts[5].partition(".")
+            if not name.isdigit() or extension not in ("png", "raw"):
+                raise NotFound(f"No endpoint at {self.path}")
+            file_path, entry, version = server.slice_entry(patient, series_number, thickness, int(name))
+            if extension == "raw":
+                etag = self.etag(file_path, version, "raw")
+                if self.not_modified(etag):
+                    return
+                image = np.ascontiguousarray(server.slice_cache.get(file_path))
+                headers = {"X-Rows": image.shape[0], "X-Columns": image.shape[1], "X-Dtype": image.dtype.str}
+                return self.send_body(image.tobytes(), "application/octet-stream", etag, headers)
+            window_width = self.number(query, "ww", entry["window_width"])
+            window_center = self.number(query, "wc", entry["window_center"])
+            etag = self.etag(file_path, version, f"png:{window_width}:{window_center}")
+            if self.not_modified(etag):
+                return
+            data = server.rendered((file_path, version, window_width, window_center), lambda: encode_png(window_to_uint8(server.slice_cache.get(file_path), window_width, window_center)))
+            return self.send_body(data, "image/png", etag)
+        raise NotFound(f"No endpoint at {self.path}")
+
+    # Request helpers
+
+    @staticmethod
+    def thickness(query):
+        value = query.get("thickness", "none")
+        if value.lower() == "none":
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            raise BadRequest(f"Invalid thickness {value!r}")
+
+    @staticmethod
+    def number(query, key, default):
+        if key not in query:
+            return default
+        try:
+            return float(query[key])
+        except ValueError:
+            raise BadRequest(f"Invalid {key} {query[key]!r}")
+
+    @staticmethod
+    def etag(file_path, version, variant):
+        # Path, file mtime/size and rendering parameters identify the content, so overwritten slices get a new tag
+        mtime_ns, size = version
+        return '"' + hashlib.sha1(f"{file_path}|{mtime_ns}|{size}|{variant}".encode("utf-8")).hexdigest() + '"'
+
+    def not_modified(self, etag):
+        if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return True
+        return False
+
+    def send_json(self, payload, status=HTTPStatus.OK):
+        body = json.dumps(payload).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if status == HTTPStatus.OK and self.not_modified(etag):
+            return
+        self.send_body(body, "application/json", etag, status=status, cache_control="no-cache")
+
+    def send_body(self, body, content_type, etag, headers=None, status=HTTPStatus.OK, cache_control="no-cache"):
+        if status == HTTPStatus.OK and self.not_modified(etag):
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", cache_control)
+        for key, value in (headers or {}).items():
+            self.send_header(key, str(value))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(root_folder, host="127.0.0.1", port=8000):
+    server = StudyServer(root_folder, (host, port))
+    print(f"Serving {server.root_folder} on http://{server.server_address[0]}:{server.server_address[1]}/patients")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a folder of patient studies over HTTP.")
+    parser.add_argument("folder", help="Root folder with one sub-folder per patient")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    if not os.path.isdir(args.folder):
+        print(f"Error: The specified folder '{args.folder}' does not exist.")
+        raise SystemExit(1)
+    serve(args.folder, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
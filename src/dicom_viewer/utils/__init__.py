@@ -4,12 +4,13 @@ Utility functions and helpers.
 Contains utility functions for image processing, series analysis, and other helper functions.
 """
 
-from .series_utils import find_unique_series_numbers_and_thicknesses, show_dicom_study
+from .series_utils import find_unique_series_numbers_and_thicknesses, show_dicom_study, show_dicom_studies
 from .image_utils import load_dicom_image, increase_contrast
 
 __all__ = [
     "find_unique_series_numbers_and_thicknesses", 
     "show_dicom_study",
+    "show_dicom_studies",
     "load_dicom_image",
     "increase_contrast"
 ]
\ No newline at end of file
@@ -4,19 +4,24 @@ Image processing utilities for DICOM files.
 Contains utility functions for loading, processing, and enhancing DICOM images.
 """
 
+import os
 import numpy as np
 from PIL import Image
-import pydicom
+from ..core.slice_cache import shared_header_index, shared_slice_cache
 
 
-def load_dicom_image(file_path, scale_factor=4):
+def load_dicom_image(file_path, scale_factor=4, header_index=None, slice_cache=None):
     """Load and process a DICOM image with optional scaling."""
-    dicom_data = pydicom.dcmread(file_path)
-    image = dicom_data.pixel_array.astype(float)
+    # Header and pixels come from the shared index and cache unless given, so local copies are used when configured
+    header_index = header_index if header_index is not None else shared_header_index
+    slice_cache = slice_cache if slice_cache is not None else shared_slice_cache
+    folder_path, file_name = os.path.split(os.path.abspath(file_path))
+    entry = header_index.scan(folder_path)[file_name]
+    image = slice_cache.get(file_path).astype(float)
     
     # Apply contrast enhancement only if thickness is defined
-    if hasattr(dicom_data, 'SliceThickness'):
-        if float(dicom_data.SliceThickness) >= 1.0:
+    if entry["thickness"] is not None:
+        if entry["thickness"] >= 1.0:
             image = increase_contrast(image)
     
     # Normalize and convert to PIL Image
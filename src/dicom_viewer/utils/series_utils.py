@@ -1,39 +1,50 @@
 import os
-import pydicom
 import tkinter as tk
 from tkinter import Button
 import matplotlib.pyplot as plt
 from ..core.dicom_viewer import DicomViewer
+from ..core.hanging_layout import HangingLayout
+from ..core.slice_cache import shared_header_index
 
-def find_unique_series_numbers_and_thicknesses(folder_path):
+def find_unique_series_numbers_and_thicknesses(folder_path, header_index=None):
+    header_index = header_index if header_index is not None else shared_header_index
     series_data = {}
-    for file_name in os.listdir(folder_path):
-        if file_name.endswith('.dcm'):
-            file_path = os.path.join(folder_path, file_name)
-            ds = pydicom.dcmread(file_path)
-            series_number = str(ds.get("SeriesNumber"))
-            thickness = ds.get("SliceThickness")
-            series_description = ds.get("SeriesDescription")  # Obtener la descripción de la serie
-            if series_number in series_data:
-                if thickness is not None:
-                    series_data[series_number]['thicknesses'].add(thickness)
-                else:
-                    series_data[series_number]['no_thickness'].append(file_name)
+    for file_name, entry in header_index.scan(folder_path).items():
+        series_number = entry["series_number"]
+        thickness = entry["thickness"]
+        series_description = entry["series_description"]  # Obtener la descripción de la serie
+        if series_number in series_data:
+            if thickness is not None:
+                series_data[series_number]['thicknesses'].add(thickness)
             else:
-                series_data[series_number] = {'thicknesses': set(), 'no_thickness': [], 'series_description': series_description}  # Agregar la descripción de la serie
-                if thickness is not None:
-                    series_data[series_number]['thicknesses'].add(thickness)
-                else:
-                    series_data[series_number]['no_thickness'].append(file_name)
+                series_data[series_number]['no_thickness'].append(file_name)
+        else:
+            series_data[series_number] = {'thicknesses': set(), 'no_thickness': [], 'series_description': series_description}  # Agregar la descripción de la serie
+            if thickness is not None:
+                series_data[series_number]['thicknesses'].add(thickness)
+            else:
+                series_data[series_number]['no_thickness'].append(file_name)
     return series_data
 
 
 def show_dicom_study(folder_path, series_number, thickness):
     fig = plt.figure()
-    viewer = DicomViewer(folder_path, series_number, thickness, fig)
+    viewer = DicomViewer(folder_path, series_number, thickness, fig, progressive=True)
     viewer.show_dicom()
     plt.show()
 
+def show_dicom_studies(series, rows=None, cols=None, sync_scroll=True, sync_window=False):
+    """Open several (folder_path, series_number, thickness) series side by side in one figure."""
+    if rows is None or cols is None:
+        cols = cols or min(len(series), 3)
+        rows = rows or -(-len(series) // cols)
+    layout = HangingLayout(rows, cols, sync_scroll=sync_scroll, sync_window=sync_window, progressive=True)
+    for folder_path, series_number, thickness in series:
+        layout.add_series(folder_path, series_number, thickness)
+    layout.show()
+    plt.show()
+    return layout
+
 def main():
     folder_path = r'D:\TFG\estudios_ct\1'
     series_data = find_unique_series_numbers_and_thicknesses(folder_path)
@@ -0,0 +1,9 @@
+import os
+import sys
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+# Run against the source tree without installing the package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
@@ -0,0 +1,114 @@
+import os
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import CTImageStorage, ExplicitVRLittleEndian, generate_uid
+
+from dicom_viewer.core.dicom_viewer import DicomViewer
+from dicom_viewer.core.progressive_loader import ProgressiveLoader
+from dicom_viewer.core.slice_cache import HeaderIndex, SliceCache
+
+
+def write_slice(folder, name, instance_number, size=16):
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = CTImageStorage
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.SOPClassUID = CTImageStorage
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.SeriesNumber = 301
+    ds.InstanceNumber = instance_number
+    ds.SliceThickness = 1.0
+    ds.Rows = ds.Columns = size
+    ds.BitsAllocated = 16
+    ds.BitsStored = 12
+    ds.HighBit = 11
+    ds.PixelRepresentation = 0
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.PixelData = np.full((size, size), instance_number, dtype=np.uint16).tobytes()
+    path = os.path.join(folder, name)
+    ds.save_as(path, enforce_file_format=True)
+    return path
+
+
+def truncate_pixel_data(path, nbytes=100):
+    with open(path, "r+b") as fh:
+        fh.truncate(os.path.getsize(path) - nbytes)
+
+
+class SynchronousExecutor:
+    """Runs each job inside submit(), so its future is already done when callbacks are attached."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail("timed out")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def corrupt_slice(tmp_path):
+    write_slice(tmp_path, "0001.dcm", 1)
+    path = write_slice(tmp_path, "0002.dcm", 2)
+    truncate_pixel_data(path)
+    return path
+
+
+def test_failed_decode_that_finished_before_callback_is_not_left_pending(corrupt_slice):
+    loader = ProgressiveLoader(SliceCache())
+    loader._executor = SynchronousExecutor()
+    loader.request(corrupt_slice)
+    assert not loader.is_pending(corrupt_slice)
+    assert list(loader.poll_failures()) == [corrupt_slice]
+    assert not loader.busy
+    loader.shutdown()
+
+
+def test_failed_decode_is_reported(corrupt_slice):
+    loader = ProgressiveLoader(SliceCache())
+    loader.request(corrupt_slice)
+    failures = {}
+    wait_until(lambda: failures.update(loader.poll_failures()) or not loader.busy)
+    assert corrupt_slice in failures
+    assert not loader.is_pending(corrupt_slice)
+    loader.shutdown()
+
+
+def test_viewer_shows_error_for_corrupt_slice(tmp_path, corrupt_slice):
+    viewer = DicomViewer(str(tmp_path), "301", 1.0, slice_cache=SliceCache(), header_index=HeaderIndex(),
+                         connect_events=False, progressive=True, prefetch=0)
+    viewer.current_dicom_index = 1
+    viewer.show_dicom()
+    wait_until(lambda: viewer.poll_loads() or not viewer.loader.busy)
+    assert "(error)" in viewer.ax.get_title()
+    assert viewer.image_artist is None or not viewer.image_artist.get_visible()
+    assert viewer.error_text.get_visible()
+    assert "0002.dcm" in viewer.error_text.get_text()
+
+    # A good slice clears the error again
+    viewer.current_dicom_index = 0
+    viewer.show_dicom()
+    wait_until(lambda: viewer.poll_loads() or not viewer.loader.busy)
+    assert "cargando" not in viewer.ax.get_title() and "(error)" not in viewer.ax.get_title()
+    assert viewer.image_artist.get_visible()
+    assert viewer.error_text is None or not viewer.error_text.get_visible()
+    viewer.close()